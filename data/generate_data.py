@@ -8,14 +8,248 @@ Generates reproducible synthetic datasets for benchmarking.
 import argparse
 import hashlib
 import json
+import mmap
 import os
 import struct
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List
 import numpy as np
 
+try:
+    import ml_dtypes
+    BF16_AVAILABLE = True
+except ImportError:
+    BF16_AVAILABLE = False
 
-def generate_dataset(N: int, M: int, D: int, seed: int, output_dir: str):
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+
+# 2.x datasets are drawn from np.random.Generator(PCG64(seed)); 1.x used
+# the legacy np.random.seed/randn (MT19937) stream.
+DATASET_SCHEMA_VERSION = "2.0.0"
+
+# --dtype choice -> dtype name stored in metadata.json (the choice is also
+# the data file suffix, e.g. embeddings.f32)
+DTYPES = {
+    'f64': 'float64',
+    'f32': 'float32',
+    'bf16': 'bfloat16',
+}
+
+# Supported dataset hashes; sha256 stays the default for compatibility
+HASH_ALGOS = ('sha256', 'blake3')
+# Suffix marking a --hash-chunks > 1 tree digest in metadata['hash_algo']
+# (e.g. 'sha256-tree'); such a digest is not the plain hash of the data
+TREE_HASH_SUFFIX = '-tree'
+
+# Generation tile size: small enough that a tile stays in L2 while it is
+# hashed and written
+TILE_BYTES = 512 * 1024
+
+
+def resolve_dtype(name: str) -> np.dtype:
+    """Map a metadata dtype name to a NumPy dtype."""
+    if name == 'bfloat16':
+        if not BF16_AVAILABLE:
+            raise RuntimeError("bfloat16 datasets require ml_dtypes (pip install ml-dtypes)")
+        return np.dtype(ml_dtypes.bfloat16)
+    return np.dtype(name)
+
+
+def _byte_view(array: np.ndarray) -> memoryview:
+    # Viewing as uint8 first also covers extension dtypes such as bfloat16,
+    # which do not export a buffer format of their own.
+    return memoryview(array.view(np.uint8)).cast('B')
+
+
+def new_hasher(algo: str = 'sha256'):
+    """Create an empty hash object for the given dataset hash algorithm."""
+    if algo == 'blake3':
+        if not BLAKE3_AVAILABLE:
+            raise RuntimeError("blake3 hashing requires the blake3 package (pip install blake3)")
+        return blake3.blake3(max_threads=blake3.blake3.AUTO)
+    if algo != 'sha256':
+        raise ValueError(f"Unknown hash algorithm '{algo}' (expected one of {', '.join(HASH_ALGOS)})")
+    return hashlib.sha256()
+
+
+def _sha256_digest(view: memoryview) -> bytes:
+    return hashlib.sha256(view).digest()
+
+
+def dataset_digest(arrays: List[np.ndarray], chunks: int = 1, algo: str = 'sha256') -> str:
+    """
+    Hash dataset arrays without copying them.
+    
+    With chunks=1 this is a plain SHA-256 over the concatenated buffers.
+    With chunks>1 each buffer is split into `chunks` contiguous slices that
+    are hashed in parallel (hashlib releases the GIL on large buffers), and
+    the result is the SHA-256 of every slice digest followed by its length.
+    BLAKE3 is tree-parallel internally, so chunks only applies to sha256.
+    
+    Args:
+        arrays: C-contiguous arrays, hashed in order
+        chunks: Number of slices per array
+        algo: One of HASH_ALGOS
+    """
+    if chunks <= 1 or algo != 'sha256':
+        hasher = new_hasher(algo)
+        for array in arrays:
+            hasher.update(_byte_view(array))
+        return hasher.hexdigest()
+    
+    views = []
+    for array in arrays:
+        buf = _byte_view(array)
+        offset = 0
+        for length in _slice_lengths(len(buf), chunks):
+            views.append(buf[offset:offset + length])
+            offset += length
+    
+    with ThreadPoolExecutor(max_workers=min(chunks, os.cpu_count() or 1)) as pool:
+        digests = list(pool.map(_sha256_digest, views))
+    
+    return _combine_digests(digests, [len(view) for view in views])
+
+
+def _slice_lengths(size: int, chunks: int) -> List[int]:
+    step = max(1, -(-size // chunks))
+    return [min(step, size - i) for i in range(0, size, step)]
+
+
+def _combine_digests(digests: List[bytes], lengths: List[int]) -> str:
+    root = hashlib.sha256()
+    for digest, length in zip(digests, lengths):
+        root.update(digest)
+        root.update(struct.pack('<Q', length))
+    return root.hexdigest()
+
+
+class DatasetHasher:
+    """
+    Incremental form of dataset_digest for data produced tile by tile.
+    
+    Bytes passed to update() are routed to the same per-slice SHA-256
+    states that dataset_digest would hash in parallel, so both produce the
+    same digest for the same arrays. Slices are hashed one after another
+    as the tiles stream past (only one tile is held at a time), so chunks
+    only buys parallelism in dataset_digest, i.e. when verifying.
+    """
+    
+    def __init__(self, sizes: List[int], chunks: int = 1, algo: str = 'sha256'):
+        """
+        Args:
+            sizes: Byte size of each array, in hashing order
+            chunks: Number of slices per array (sha256 only)
+            algo: One of HASH_ALGOS
+        """
+        self.chunks = chunks if algo == 'sha256' else 1
+        self._hasher = new_hasher(algo)
+        self._digests = []
+        self._lengths = []
+        if self.chunks > 1:
+            for size in sizes:
+                self._lengths.extend(_slice_lengths(size, chunks))
+        self._remaining = self._lengths[0] if self._lengths else 0
+    
+    def update(self, data):
+        """Feed the next bytes of the dataset."""
+        view = memoryview(data).cast('B')
+        if self.chunks <= 1:
+            self._hasher.update(view)
+            return
+        
+        while len(view):
+            if len(self._digests) == len(self._lengths):
+                raise ValueError("More data than the declared array sizes")
+            take = min(len(view), self._remaining)
+            self._hasher.update(view[:take])
+            view = view[take:]
+            self._remaining -= take
+            if self._remaining == 0:
+                self._digests.append(self._hasher.digest())
+                self._hasher = hashlib.sha256()
+                if len(self._digests) < len(self._lengths):
+                    self._remaining = self._lengths[len(self._digests)]
+    
+    def hexdigest(self) -> str:
+        if self.chunks <= 1:
+            return self._hasher.hexdigest()
+        return _combine_digests(self._digests, self._lengths)
+
+
+def write_json(path: Path, data: Dict):
+    """Write data as indented JSON, using orjson when installed."""
+    if ORJSON_AVAILABLE:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+def _generate_tiles(rng: np.random.Generator, rows: int, D: int,
+                    gen_dtype, np_dtype: np.dtype):
+    """Yield a (rows x D) standard-normal matrix as L2-sized row tiles."""
+    tile_rows = max(1, TILE_BYTES // (D * np_dtype.itemsize))
+    for start in range(0, rows, tile_rows):
+        n = min(tile_rows, rows - start)
+        yield rng.standard_normal((n, D), dtype=gen_dtype).astype(np_dtype, copy=False)
+
+
+def _prefetch(tiles):
+    """
+    Produce the next tile in a worker thread while the caller hashes and
+    writes the current one.
+    
+    Tile generation, hashing and os.write all release the GIL, so the two
+    stages overlap. Tiles are still drawn one at a time, in order, so the
+    output is identical to the sequential loop.
+    """
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(next, tiles, None)
+        while True:
+            tile = pending.result()
+            if tile is None:
+                return
+            pending = pool.submit(next, tiles, None)
+            yield tile
+
+
+def _write_all(fd: int, view: memoryview):
+    """os.write until the whole buffer is on disk (writes may be partial)."""
+    while len(view):
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _write_tiles(path: Path, tiles, hasher: DatasetHasher):
+    """Hash each tile while it is still cache-resident, then append it to path."""
+    # Tiles go straight to the fd: no stdio/BufferedWriter copy in between
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(str(path), flags, 0o644)
+    try:
+        for tile in _prefetch(tiles):
+            view = _byte_view(tile)
+            hasher.update(view)
+            _write_all(fd, view)
+    finally:
+        os.close(fd)
+
+
+def generate_dataset(N: int, M: int, D: int, seed: int, output_dir: str,
+                     hash_chunks: int = 1, dtype: str = 'f64', hash_algo: str = 'sha256'):
     """
     Generate synthetic dataset for benchmarking.
     
@@ -25,58 +259,75 @@ def generate_dataset(N: int, M: int, D: int, seed: int, output_dir: str):
         D: Dimensions per embedding
         seed: Random seed for reproducibility
         output_dir: Output directory
+        hash_chunks: Parallel hash slices per array (1 = plain SHA-256)
+        dtype: Element type, one of DTYPES ('f64', 'f32', 'bf16')
+        hash_algo: Dataset hash, one of HASH_ALGOS
     """
-    np.random.seed(seed)
+    # The seed drives an explicit PCG64 bit generator; embeddings are drawn
+    # first and axes continue from the same stream.
+    rng = np.random.Generator(np.random.PCG64(seed))
+    
+    dtype_name = DTYPES[dtype]
+    np_dtype = resolve_dtype(dtype_name)
+    # Generator only samples float32/float64; bfloat16 is cast from float32
+    gen_dtype = np.float64 if np_dtype == np.float64 else np.float32
     
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    print(f"Generating dataset: N={N}, M={M}, D={D}, seed={seed}")
+    print(f"Generating dataset: N={N}, M={M}, D={D}, seed={seed}, dtype={dtype_name}")
+    
+    # Arrays are generated, hashed and written tile by tile, so peak memory
+    # stays at one tile regardless of N
+    hasher = DatasetHasher(
+        [N * D * np_dtype.itemsize, M * D * np_dtype.itemsize], hash_chunks, hash_algo
+    )
     
     # Generate embeddings (N x D matrix)
     print(f"  Generating {N} embeddings of dimension {D}...")
-    embeddings = np.random.randn(N, D).astype(np.float64)
-    embeddings_file = output_path / "embeddings.f64"
-    embeddings.tofile(embeddings_file)
+    embeddings_file = output_path / f"embeddings.{dtype}"
+    _write_tiles(embeddings_file, _generate_tiles(rng, N, D, gen_dtype, np_dtype), hasher)
     print(f"  ✓ Saved to {embeddings_file}")
     
     # Generate axes (M x D matrix)
     print(f"  Generating {M} axes of dimension {D}...")
-    axes = np.random.randn(M, D).astype(np.float64)
-    axes_file = output_path / "axes.f64"
-    axes.tofile(axes_file)
+    axes_file = output_path / f"axes.{dtype}"
+    _write_tiles(axes_file, _generate_tiles(rng, M, D, gen_dtype, np_dtype), hasher)
     print(f"  ✓ Saved to {axes_file}")
     
-    # Calculate dataset hash
-    print("  Calculating dataset hash...")
-    hasher = hashlib.sha256()
-    hasher.update(embeddings.tobytes())
-    hasher.update(axes.tobytes())
     dataset_hash = hasher.hexdigest()
     print(f"  ✓ Hash: {dataset_hash[:16]}...")
     
     # Generate metadata
     metadata = {
-        "hash_sha256": dataset_hash,
+        "schema_version": DATASET_SCHEMA_VERSION,
+        "hash_algo": hash_algo if hash_chunks == 1 else hash_algo + TREE_HASH_SUFFIX,
+        "hash": dataset_hash,
+        "hash_chunks": hash_chunks,
         "N": N,
         "M": M,
         "D": D,
         "seed": seed,
-        "embeddings_file": "embeddings.f64",
-        "axes_file": "axes.f64",
+        "rng": "PCG64",
+        "embeddings_file": embeddings_file.name,
+        "axes_file": axes_file.name,
         "embeddings_shape": [N, D],
         "axes_shape": [M, D],
-        "dtype": "float64",
+        "dtype": dtype_name,
         "size_bytes": {
-            "embeddings": N * D * 8,
-            "axes": M * D * 8,
-            "total": (N * D + M * D) * 8
+            "embeddings": N * D * np_dtype.itemsize,
+            "axes": M * D * np_dtype.itemsize,
+            "total": (N * D + M * D) * np_dtype.itemsize
         }
     }
     
+    # Keep the legacy key for consumers that only know SHA-256 datasets
+    # (only when the digest really is the SHA-256 of the data)
+    if hash_algo == 'sha256' and hash_chunks == 1:
+        metadata["hash_sha256"] = dataset_hash
+    
     metadata_file = output_path / "metadata.json"
-    with open(metadata_file, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    write_json(metadata_file, metadata)
     print(f"  ✓ Saved metadata to {metadata_file}")
     
     # Create dataset lock file
@@ -92,6 +343,16 @@ def generate_dataset(N: int, M: int, D: int, seed: int, output_dir: str):
     return metadata
 
 
+def _map_array(path: Path, dtype: np.dtype, shape) -> np.ndarray:
+    """Map a data file read-only as an array, hinting sequential readahead."""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    # The array keeps the mapping alive through its base buffer
+    return np.frombuffer(mapped, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
+
+
 def verify_dataset(output_dir: str):
     """Verify dataset integrity."""
     output_path = Path(output_dir)
@@ -118,22 +379,49 @@ def verify_dataset(output_dir: str):
     # Verify hash
     N, D = metadata['embeddings_shape']
     M = metadata['axes_shape'][0]
+    try:
+        np_dtype = resolve_dtype(metadata.get('dtype', 'float64'))
+    except RuntimeError as e:
+        # e.g. a bfloat16 dataset without ml_dtypes installed
+        print(f"✗ {e}")
+        return False
+    
+    # Mapping only covers the expected elements, so extra or missing bytes
+    # must be caught here
+    for path, rows in ((embeddings_file, N), (axes_file, M)):
+        expected_size = rows * D * np_dtype.itemsize
+        actual_size = path.stat().st_size
+        if actual_size != expected_size:
+            print(f"✗ {path.name} size mismatch!")
+            print(f"  Expected: {expected_size} bytes")
+            print(f"  Got:      {actual_size} bytes")
+            return False
+    
+    hash_algo = metadata.get('hash_algo', 'sha256')
+    base_algo = hash_algo[:-len(TREE_HASH_SUFFIX)] if hash_algo.endswith(TREE_HASH_SUFFIX) else hash_algo
+    if base_algo not in HASH_ALGOS:
+        print(f"✗ Unknown hash_algo '{hash_algo}' in metadata")
+        return False
+    if base_algo == 'blake3' and not BLAKE3_AVAILABLE:
+        print("✗ Verifying a blake3 dataset requires the blake3 package (pip install blake3)")
+        return False
     
-    embeddings = np.fromfile(embeddings_file, dtype=np.float64).reshape(N, D)
-    axes = np.fromfile(axes_file, dtype=np.float64).reshape(M, D)
+    # Map the files read-only so the page cache is hashed in place
+    embeddings = _map_array(embeddings_file, np_dtype, (N, D))
+    axes = _map_array(axes_file, np_dtype, (M, D))
     
-    hasher = hashlib.sha256()
-    hasher.update(embeddings.tobytes())
-    hasher.update(axes.tobytes())
-    calculated_hash = hasher.hexdigest()
+    expected_hash = metadata.get('hash', metadata.get('hash_sha256'))
+    calculated_hash = dataset_digest(
+        [embeddings, axes], metadata.get('hash_chunks', 1), base_algo
+    )
     
-    if calculated_hash != metadata['hash_sha256']:
+    if calculated_hash != expected_hash:
         print(f"✗ Hash mismatch!")
-        print(f"  Expected: {metadata['hash_sha256']}")
+        print(f"  Expected: {expected_hash}")
         print(f"  Got:      {calculated_hash}")
         return False
     
-    print(f"✓ Dataset verified: {calculated_hash[:16]}...")
+    print(f"✓ Dataset verified ({hash_algo}): {calculated_hash[:16]}...")
     return True
 
 
@@ -152,6 +440,15 @@ Examples:
   # Force overwrite existing dataset
   python3 data/generate_data.py --N 2000 --M 15 --D 96 --seed 42 --force
 
+  # Generate a float32 dataset (half the size of float64)
+  python3 data/generate_data.py --N 2000 --M 15 --D 96 --seed 42 --dtype f32
+
+  # Hash a large dataset in 8 slices (verified in parallel)
+  python3 data/generate_data.py --N 1000000 --M 20 --D 128 --hash-chunks 8
+
+  # Use BLAKE3 instead of SHA-256 for the integrity hash
+  python3 data/generate_data.py --N 1000000 --M 20 --D 128 --hash blake3
+
   # Verify existing dataset
   python3 data/generate_data.py --verify
         """
@@ -165,6 +462,13 @@ Examples:
                         help='Dimensions (default: 96)')
     parser.add_argument('--seed', type=int, default=42,
                         help='Random seed (default: 42)')
+    parser.add_argument('--dtype', choices=list(DTYPES), default='f64',
+                        help='Element type: f64, f32 or bf16 (bf16 needs ml_dtypes) (default: f64)')
+    parser.add_argument('--hash', choices=HASH_ALGOS, default='sha256', dest='hash_algo',
+                        help='Dataset integrity hash (default: sha256; blake3 needs the blake3 package)')
+    parser.add_argument('--hash-chunks', type=int, default=1,
+                        help='Hash each array in N slices, in parallel when verifying; '
+                             'generation hashes them serially (default: 1, plain SHA-256)')
     parser.add_argument('--output', type=str, default='data',
                         help='Output directory (default: data)')
     parser.add_argument('--force', action='store_true',
@@ -197,9 +501,26 @@ Examples:
         print("✗ N, M, and D must be positive integers")
         sys.exit(1)
     
+    if args.hash_chunks <= 0:
+        print("✗ --hash-chunks must be a positive integer")
+        sys.exit(1)
+    
+    if args.hash_algo == 'blake3' and not BLAKE3_AVAILABLE:
+        print("✗ --hash blake3 requires the blake3 package (pip install blake3)")
+        sys.exit(1)
+    
+    if args.hash_algo != 'sha256' and args.hash_chunks != 1:
+        print("✗ --hash-chunks only applies to --hash sha256")
+        sys.exit(1)
+    
+    if args.dtype == 'bf16' and not BF16_AVAILABLE:
+        print("✗ --dtype bf16 requires ml_dtypes (pip install ml-dtypes)")
+        sys.exit(1)
+    
     # Generate dataset
     try:
-        metadata = generate_dataset(args.N, args.M, args.D, args.seed, args.output)
+        metadata = generate_dataset(args.N, args.M, args.D, args.seed, args.output,
+                                    args.hash_chunks, args.dtype, args.hash_algo)
         
         # Verify what we just generated
         if verify_dataset(args.output):
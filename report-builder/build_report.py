@@ -13,13 +13,63 @@ import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional
-import statistics
 import socket
 import platform
 import subprocess
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+# Business assumptions used to turn a per-execution delta into yearly impact
+IMPACT_INPUTS = {
+    'executions_per_day': 100,
+    'days_per_year': 250,
+    'cost_model': 'infra',
+    'cost_per_hour_eur': 0.50,
+    'electricity_kwh_per_hour': 0.15,
+    'co2_kg_per_kwh': 0.475
+}
+
+
+def _read_git_head(git_dir: Path) -> Optional[str]:
+    """Resolve HEAD from a .git directory without spawning git."""
+    head = (git_dir / 'HEAD').read_text().strip()
+    if not head.startswith('ref: '):
+        return head  # detached HEAD
+    
+    ref = head[len('ref: '):]
+    ref_file = git_dir / ref
+    if ref_file.is_file():
+        return ref_file.read_text().strip()
+    
+    packed_refs = git_dir / 'packed-refs'
+    if packed_refs.is_file():
+        for line in packed_refs.read_text().splitlines():
+            if line.endswith(' ' + ref):
+                return line.split()[0]
+    return None  # unborn branch
 
 
 def get_git_commit() -> Optional[str]:
+    cwd = Path.cwd()
+    for directory in (cwd, *cwd.parents):
+        git_dir = directory / '.git'
+        if git_dir.is_dir():
+            try:
+                return _read_git_head(git_dir)
+            except OSError:
+                break
+        if git_dir.exists():
+            # .git file (worktree/submodule): let git resolve the gitdir
+            break
+    else:
+        return None
+    
     try:
         result = subprocess.run(
             ['git', 'rev-parse', 'HEAD'],
@@ -45,18 +95,24 @@ def calculate_stats(samples: List[float]) -> Dict[str, float]:
             'p90': 0.0
         }
     
-    sorted_samples = sorted(samples)
-    n = len(sorted_samples)
-    
-    median = statistics.median(sorted_samples)
-    mean = statistics.mean(sorted_samples)
-    std = statistics.stdev(sorted_samples) if n > 1 else 0.0
-    cv_pct = (std / mean * 100) if mean > 0 else 0.0
+    values = np.asarray(samples, dtype=np.float64)
+    n = values.size
     
+    # Percentiles use the truncated index into the sorted samples
+    # (sorted[int(n * q)]); the median averages the two middle values.
+    # np.partition places just these order statistics in O(n), no full sort.
     p10_idx = int(n * 0.1)
     p90_idx = int(n * 0.9)
-    p10 = sorted_samples[p10_idx]
-    p90 = sorted_samples[p90_idx]
+    lo_mid, hi_mid = (n - 1) // 2, n // 2
+    part = np.partition(values, [p10_idx, lo_mid, hi_mid, p90_idx])
+    
+    median = float((part[lo_mid] + part[hi_mid]) / 2)
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if n > 1 else 0.0
+    cv_pct = (std / mean * 100) if mean > 0 else 0.0
+    
+    p10 = float(part[p10_idx])
+    p90 = float(part[p90_idx])
     
     return {
         'median': median,
@@ -80,28 +136,23 @@ def determine_verdict(baseline_stats: Dict, optimized_stats: Dict) -> str:
         return 'conclusive'
 
 
-def calculate_impact(delta_ms: float, inputs: Dict) -> Dict:
+def calculate_impact(delta_ms, inputs: Dict = IMPACT_INPUTS) -> Dict:
+    """
+    Yearly impact of saving delta_ms per execution.
+    
+    delta_ms may be a float or a NumPy array of deltas (e.g. a what-if
+    grid); every output then has the same shape.
+    """
     time_saved_hours_per_year = (
         delta_ms * inputs['executions_per_day'] * inputs['days_per_year']
     ) / 3_600_000
-    
-    cost_saved_eur_per_year = (
-        time_saved_hours_per_year * inputs['cost_per_hour_eur']
-    )
-    
-    electricity_saved_kwh_per_year = (
-        time_saved_hours_per_year * inputs['electricity_kwh_per_hour']
-    )
-    
-    co2_avoided_kg_per_year = (
-        electricity_saved_kwh_per_year * inputs['co2_kg_per_kwh']
-    )
+    electricity_saved_kwh_per_year = time_saved_hours_per_year * inputs['electricity_kwh_per_hour']
     
     return {
         'time_saved_hours_per_year': time_saved_hours_per_year,
-        'cost_saved_eur_per_year': cost_saved_eur_per_year,
+        'cost_saved_eur_per_year': time_saved_hours_per_year * inputs['cost_per_hour_eur'],
         'electricity_saved_kwh_per_year': electricity_saved_kwh_per_year,
-        'co2_avoided_kg_per_year': co2_avoided_kg_per_year
+        'co2_avoided_kg_per_year': electricity_saved_kwh_per_year * inputs['co2_kg_per_kwh']
     }
 
 
@@ -135,6 +186,9 @@ def build_report(
     resource_profiles: Optional[Dict] = None
 ) -> Dict:
     
+    now = datetime.utcnow().isoformat()
+    hostname = socket.gethostname()
+    
     baseline_samples = runner_summary.get('baseline_samples', [])
     optimized_samples = runner_summary.get('optimized_samples', [])
     
@@ -146,34 +200,27 @@ def build_report(
     
     verdict = determine_verdict(baseline_stats, optimized_stats)
     
-    impact_inputs = {
-        'executions_per_day': 100,
-        'days_per_year': 250,
-        'cost_model': 'infra',
-        'cost_per_hour_eur': 0.50,
-        'electricity_kwh_per_hour': 0.15,
-        'co2_kg_per_kwh': 0.475
-    }
-    
+    impact_inputs = dict(IMPACT_INPUTS)
     impact_outputs = calculate_impact(delta_ms, impact_inputs)
     
     report = {
         'schema_version': '1.0.0',
         'meta': {
-            'report_id': hashlib.sha256(
-                f"{datetime.utcnow().isoformat()}{socket.gethostname()}".encode()
-            ).hexdigest()[:16],
-            'generated_at': datetime.utcnow().isoformat() + 'Z',
+            'report_id': hashlib.sha256(f"{now}{hostname}".encode()).hexdigest()[:16],
+            'generated_at': now + 'Z',
             'app_version': '1.0.0',
             'git_commit': get_git_commit(),
             'machine': {
-                'hostname': socket.gethostname(),
+                'hostname': hostname,
                 'os': platform.system(),
                 'kernel': platform.release(),
                 'cpu_model': platform.processor() or 'unknown',
             },
             'dataset': {
                 'hash_sha256': metadata.get('hash_sha256', ''),
+                'hash_algo': metadata.get('hash_algo', 'sha256'),
+                'hash': metadata.get('hash', metadata.get('hash_sha256', '')),
+                'hash_chunks': metadata.get('hash_chunks', 1),
                 'N': metadata.get('N', 0),
                 'M': metadata.get('M', 0),
                 'D': metadata.get('D', 0),
@@ -198,7 +245,7 @@ def build_report(
                     'NUMEXPR_NUM_THREADS': '1'
                 }
             },
-            'cpu_affinity': runner_summary.get('cpu_affinity') or 2,
+            'cpu_affinity': runner_summary.get('cpu_affinity'),
             'impls': [
                 {'name': baseline_impl, 'variant': baseline_variant},
                 {'name': optimized_impl, 'variant': optimized_variant}
@@ -245,9 +292,24 @@ def build_report(
     if resource_profiles:
         report['resource_profiles'] = resource_profiles
     
+    # Unpinned runs have no core to report
+    if report['benchmark']['cpu_affinity'] is None:
+        del report['benchmark']['cpu_affinity']
+    
     return report
 
 
+def write_json(path: str, data: Any):
+    """Write data as indented JSON, using orjson when installed."""
+    if ORJSON_AVAILABLE:
+        Path(path).write_bytes(
+            orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        )
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Build ChainBench report.json from runner + eBPF data'
@@ -291,8 +353,7 @@ def main():
     )
     
     print(f"Writing report to {args.output}")
-    with open(args.output, 'w') as f:
-        json.dump(report, f, indent=2)
+    write_json(args.output, report)
     
     print(f"✓ Report generated: {args.output}")
     print(f"  - Baseline: {report['summary']['baseline_stats']['median']:.1f} ms")
@@ -7,13 +7,28 @@ Samples CPU, RAM, I/O, and optionally GPU usage during benchmark execution.
 
 import psutil
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import threading
+import numpy as np
+
+
+# Per-sample metrics, stored column-wise (one float64 array per metric)
+SAMPLE_FIELDS = (
+    'timestamp',
+    'elapsed_ms',
+    'cpu_percent',
+    'ram_mb',
+    'io_read_mb',
+    'io_write_mb',
+    'gpu_percent',
+)
 
 
 class ResourceProfiler:
     """Profiles system resource usage during benchmark execution."""
     
+    INITIAL_CAPACITY = 4096
+    
     def __init__(self, pid: Optional[int] = None, sample_interval: float = 0.1):
         """
         Initialize profiler.
@@ -24,10 +39,13 @@ class ResourceProfiler:
         """
         self.pid = pid
         self.sample_interval = sample_interval
-        self.samples = []
+        self._reset_columns()
         self.running = False
+        self.active = False
         self.thread = None
         self.process = None
+        self._lock = threading.Lock()
+        self._cpu_baseline = (0.0, 0.0)
         
         if pid:
             try:
@@ -35,6 +53,36 @@ class ResourceProfiler:
             except psutil.NoSuchProcess:
                 self.process = None
     
+    def _reset_columns(self):
+        self._n = 0
+        self._active_ms = 0.0
+        self._columns = {
+            field: np.empty(self.INITIAL_CAPACITY) for field in SAMPLE_FIELDS
+        }
+    
+    def _append(self, sample: Dict):
+        """Store one sample, doubling column capacity when full."""
+        capacity = len(self._columns['timestamp'])
+        if self._n == capacity:
+            for field, column in self._columns.items():
+                grown = np.empty(capacity * 2)
+                grown[:capacity] = column
+                self._columns[field] = grown
+        
+        for field in SAMPLE_FIELDS:
+            self._columns[field][self._n] = sample[field]
+        self._n += 1
+    
+    def _column(self, field: str) -> np.ndarray:
+        """View of the recorded values of one metric."""
+        return self._columns[field][:self._n]
+    
+    @property
+    def samples(self) -> List[Dict]:
+        """Recorded samples as a list of dicts (rebuilt from the columns)."""
+        columns = [self._column(field).tolist() for field in SAMPLE_FIELDS]
+        return [dict(zip(SAMPLE_FIELDS, values)) for values in zip(*columns)]
+    
     def _sample_resources(self) -> Dict:
         """Sample current resource usage."""
         sample = {
@@ -42,20 +90,22 @@ class ResourceProfiler:
         }
         
         if self.process:
-            # Process-specific metrics
+            # Process-specific metrics; oneshot() reads /proc once per sample
+            # and serves every field below from that cache
             try:
-                sample['cpu_percent'] = self.process.cpu_percent(interval=0.01)
-                mem_info = self.process.memory_info()
-                sample['ram_mb'] = mem_info.rss / (1024 * 1024)
-                
-                # I/O counters (if available)
-                try:
-                    io_counters = self.process.io_counters()
-                    sample['io_read_mb'] = io_counters.read_bytes / (1024 * 1024)
-                    sample['io_write_mb'] = io_counters.write_bytes / (1024 * 1024)
-                except (AttributeError, psutil.AccessDenied):
-                    sample['io_read_mb'] = 0
-                    sample['io_write_mb'] = 0
+                with self.process.oneshot():
+                    sample['cpu_percent'] = self._cpu_percent()
+                    mem_info = self.process.memory_info()
+                    sample['ram_mb'] = mem_info.rss / (1024 * 1024)
+                    
+                    # I/O counters (if available)
+                    try:
+                        io_counters = self.process.io_counters()
+                        sample['io_read_mb'] = io_counters.read_bytes / (1024 * 1024)
+                        sample['io_write_mb'] = io_counters.write_bytes / (1024 * 1024)
+                    except (AttributeError, psutil.AccessDenied):
+                        sample['io_read_mb'] = 0
+                        sample['io_write_mb'] = 0
                 
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 sample['cpu_percent'] = 0
@@ -64,7 +114,7 @@ class ResourceProfiler:
                 sample['io_write_mb'] = 0
         else:
             # System-wide metrics
-            sample['cpu_percent'] = psutil.cpu_percent(interval=0.01)
+            sample['cpu_percent'] = self._cpu_percent()
             mem = psutil.virtual_memory()
             sample['ram_mb'] = mem.used / (1024 * 1024)
             
@@ -82,23 +132,100 @@ class ResourceProfiler:
         
         return sample
     
-    def _profiling_loop(self):
-        """Background thread that samples resources."""
-        start_time = time.time()
+    def _cpu_clock(self) -> Tuple[float, float]:
+        """
+        Read (busy, total) CPU seconds for the monitored target.
         
+        CPU% is the busy/total delta between two readings. The baseline is
+        kept on the profiler (not in psutil's per-thread cpu_percent state),
+        so it stays valid whichever thread takes the reading.
+        """
+        if self.process:
+            times = self.process.cpu_times()
+            return times.user + times.system, time.time()
+        times = psutil.cpu_times()
+        # guest time is already included in user/nice
+        total = sum(times) - getattr(times, 'guest', 0.0) - getattr(times, 'guest_nice', 0.0)
+        return total - times.idle - getattr(times, 'iowait', 0.0), total
+    
+    def _cpu_percent(self) -> float:
+        """CPU% since the previous reading (or resume), advancing the baseline."""
+        busy, total = self._cpu_clock()
+        last_busy, last_total = self._cpu_baseline
+        self._cpu_baseline = (busy, total)
+        if total <= last_total:
+            return 0.0
+        percent = (busy - last_busy) / (total - last_total) * 100
+        # A process may use several cores; system-wide usage is capped at 100
+        return max(0.0, percent if self.process else min(percent, 100.0))
+    
+    def _record(self, now: float):
+        """Take one sample on the active-time axis (caller holds the lock)."""
+        sample = self._sample_resources()
+        sample['elapsed_ms'] = self._active_ms + (now - self._resumed_at) * 1000
+        self._append(sample)
+        self._window_start = now
+    
+    def _profiling_loop(self):
+        """Background thread that samples resources while active."""
         while self.running:
-            sample = self._sample_resources()
-            sample['elapsed_ms'] = (sample['timestamp'] - start_time) * 1000
-            self.samples.append(sample)
             time.sleep(self.sample_interval)
+            with self._lock:
+                # Skip windows cut short by a resume, their CPU% is noise
+                now = time.time()
+                if self.active and now - self._window_start >= self.sample_interval:
+                    self._record(now)
     
-    def start(self):
-        """Start profiling."""
+    def resume(self):
+        """
+        (Re)start sampling on the running profiler thread.
+        
+        Paused time is excluded from elapsed_ms, so profiles of interleaved
+        runs only cover this profiler's own runs.
+        """
+        with self._lock:
+            if self.active:
+                return
+            try:
+                self._cpu_baseline = self._cpu_clock()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self._cpu_baseline = (0.0, 0.0)
+            self._resumed_at = self._window_start = time.time()
+            self._segment_start = self._n
+            self.active = True
+    
+    def pause(self):
+        """
+        Suspend sampling without stopping the thread.
+        
+        A segment shorter than one interval gets one closing sample, so
+        short runs still show up in the profile, as long as it lasted at
+        least half an interval (CPU% over a shorter window is noise).
+        """
+        with self._lock:
+            if not self.active:
+                return
+            now = time.time()
+            if (self._n == self._segment_start
+                    and now - self._window_start >= self.sample_interval / 2):
+                self._record(now)
+            self._active_ms += (now - self._resumed_at) * 1000
+            self.active = False
+    
+    def start(self, paused: bool = False):
+        """
+        Start profiling.
+        
+        Args:
+            paused: Start the sampling thread without sampling until resume()
+        """
         if self.running:
             return
         
-        self.samples = []
+        self._reset_columns()
         self.running = True
+        if not paused:
+            self.resume()
         self.thread = threading.Thread(target=self._profiling_loop, daemon=True)
         self.thread.start()
     
@@ -107,15 +234,17 @@ class ResourceProfiler:
         if not self.running:
             return self.samples
         
+        self.pause()
         self.running = False
         if self.thread:
-            self.thread.join(timeout=1.0)
+            self.thread.join(timeout=self.sample_interval + 1.0)
         
         return self.samples
     
     def get_summary(self) -> Dict:
         """Get summary statistics from samples."""
-        if not self.samples:
+        n = self._n
+        if n == 0:
             return {
                 'cpu_avg': 0,
                 'cpu_max': 0,
@@ -123,32 +252,35 @@ class ResourceProfiler:
                 'ram_max_mb': 0,
                 'io_total_mb': 0,
                 'gpu_avg': 0,
-                'duration_ms': 0
+                'duration_ms': 0,
+                'sample_count': 0
             }
         
-        cpu_values = [s['cpu_percent'] for s in self.samples]
-        ram_values = [s['ram_mb'] for s in self.samples]
-        gpu_values = [s['gpu_percent'] for s in self.samples]
+        cpu_values = self._column('cpu_percent')
+        ram_values = self._column('ram_mb')
+        gpu_values = self._column('gpu_percent')
         
         # Calculate I/O delta (total transferred)
-        if len(self.samples) > 1:
-            io_read_delta = self.samples[-1]['io_read_mb'] - self.samples[0]['io_read_mb']
-            io_write_delta = self.samples[-1]['io_write_mb'] - self.samples[0]['io_write_mb']
-            io_total = max(0, io_read_delta + io_write_delta)
+        if n > 1:
+            io_read = self._column('io_read_mb')
+            io_write = self._column('io_write_mb')
+            io_read_delta = io_read[-1] - io_read[0]
+            io_write_delta = io_write[-1] - io_write[0]
+            io_total = max(0.0, float(io_read_delta + io_write_delta))
         else:
             io_total = 0
         
-        duration_ms = self.samples[-1]['elapsed_ms'] if self.samples else 0
+        duration_ms = float(self._column('elapsed_ms')[-1])
         
         return {
-            'cpu_avg': sum(cpu_values) / len(cpu_values),
-            'cpu_max': max(cpu_values),
-            'ram_avg_mb': sum(ram_values) / len(ram_values),
-            'ram_max_mb': max(ram_values),
+            'cpu_avg': float(cpu_values.mean()),
+            'cpu_max': float(cpu_values.max()),
+            'ram_avg_mb': float(ram_values.mean()),
+            'ram_max_mb': float(ram_values.max()),
             'io_total_mb': io_total,
-            'gpu_avg': sum(gpu_values) / len(gpu_values) if gpu_values else 0,
+            'gpu_avg': float(gpu_values.mean()),
             'duration_ms': duration_ms,
-            'sample_count': len(self.samples)
+            'sample_count': n
         }
     
     def get_profile_curve(self, points: int = 50) -> Dict:
@@ -161,7 +293,8 @@ class ResourceProfiler:
         Returns:
             Dict with arrays for each metric
         """
-        if not self.samples:
+        n = self._n
+        if n == 0:
             return {
                 'timestamps': [],
                 'cpu': [],
@@ -170,32 +303,36 @@ class ResourceProfiler:
                 'gpu': []
             }
         
-        # Downsample if we have more samples than requested points
-        if len(self.samples) > points:
-            step = len(self.samples) // points
-            downsampled = self.samples[::step][:points]
+        # Downsample if we have more samples than requested points: average
+        # equal-sized buckets of consecutive samples so short spikes still
+        # contribute instead of being skipped by a stride
+        if n > points:
+            edges = np.linspace(0, n, points + 1, dtype=int)
+            starts = edges[:-1]
+            counts = np.diff(edges)
+            
+            def downsample(values: np.ndarray) -> np.ndarray:
+                return np.add.reduceat(values, starts) / counts
         else:
-            downsampled = self.samples
+            def downsample(values: np.ndarray) -> np.ndarray:
+                return values
+        
+        elapsed = downsample(self._column('elapsed_ms'))
         
         # Normalize timestamps to 0-100 scale
-        if downsampled:
-            start_time = downsampled[0]['elapsed_ms']
-            end_time = downsampled[-1]['elapsed_ms']
-            duration = end_time - start_time if end_time > start_time else 1
-            
-            timestamps = [
-                ((s['elapsed_ms'] - start_time) / duration) * 100 
-                for s in downsampled
-            ]
-        else:
-            timestamps = []
+        start_time = elapsed[0]
+        end_time = elapsed[-1]
+        duration = end_time - start_time if end_time > start_time else 1
+        timestamps = (elapsed - start_time) / duration * 100
+        
+        io = downsample(self._column('io_read_mb') + self._column('io_write_mb'))
         
         return {
-            'timestamps': timestamps,
-            'cpu': [s['cpu_percent'] for s in downsampled],
-            'ram': [s['ram_mb'] for s in downsampled],
-            'io': [s['io_read_mb'] + s['io_write_mb'] for s in downsampled],
-            'gpu': [s['gpu_percent'] for s in downsampled]
+            'timestamps': timestamps.tolist(),
+            'cpu': downsample(self._column('cpu_percent')).tolist(),
+            'ram': downsample(self._column('ram_mb')).tolist(),
+            'io': io.tolist(),
+            'gpu': downsample(self._column('gpu_percent')).tolist()
         }
 
 
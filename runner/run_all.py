@@ -8,14 +8,22 @@ Executes benchmarks with reproducibility guarantees.
 import argparse
 import csv
 import hashlib
+import hmac
+import io
 import json
 import os
 import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
-import statistics
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 try:
     from profiler import ResourceProfiler
@@ -25,6 +33,19 @@ except ImportError:
     print("Warning: Resource profiler not available (psutil not installed)")
 
 
+# Upper bound on dataset.lock bytes read (64-char hex digest + newline)
+LOCK_READ_LIMIT = 128
+
+# Environment overlay for --enforce-single-thread
+SINGLE_THREAD_ENV = {
+    'OMP_NUM_THREADS': '1',
+    'MKL_NUM_THREADS': '1',
+    'OPENBLAS_NUM_THREADS': '1',
+    'NUMEXPR_NUM_THREADS': '1',
+    'GOMAXPROCS': '1'
+}
+
+
 def check_stability(timeout: int = 60, mode: str = 'wait') -> float:
     """
     Check system stability before running benchmarks.
@@ -44,12 +65,40 @@ def check_stability(timeout: int = 60, mode: str = 'wait') -> float:
     return waited
 
 
+def apply_cpu_affinity(cpu: int) -> Optional[List[int]]:
+    """
+    Pin the runner process to a single CPU core.
+    
+    Returns:
+        Sorted list of CPUs the process is now allowed on, or None if
+        pinning is unsupported or failed
+    """
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, {cpu})
+            return sorted(os.sched_getaffinity(0))
+        
+        # Windows/macOS: fall back to psutil where it supports affinity
+        import psutil
+        process = psutil.Process()
+        process.cpu_affinity([cpu])
+        return sorted(process.cpu_affinity())
+    except (ImportError, AttributeError, OSError, ValueError) as e:
+        print(f"  ⚠ Could not pin to CPU {cpu}: {e}")
+        return None
+
+
 def load_metadata(path: str) -> Dict:
     """Load dataset metadata."""
     with open(path, 'r') as f:
         return json.load(f)
 
 
+def dataset_hash(metadata: Dict) -> str:
+    """Dataset digest from metadata (pre-2.0.0 datasets only have hash_sha256)."""
+    return metadata.get('hash', metadata.get('hash_sha256', ''))
+
+
 def verify_dataset_lock(metadata: Dict, data_dir: str) -> bool:
     """Verify dataset hasn't changed."""
     lock_file = Path(data_dir) / "dataset.lock"
@@ -57,19 +106,37 @@ def verify_dataset_lock(metadata: Dict, data_dir: str) -> bool:
         print("✗ dataset.lock not found")
         return False
     
-    with open(lock_file, 'r') as f:
-        lock_hash = f.read().strip()
+    # The lock holds one hex digest; read a bounded amount (with room for
+    # a trailing newline) and reject anything longer outright
+    with open(lock_file, 'rb') as f:
+        lock_hash = f.read(LOCK_READ_LIMIT + 1)
+    if len(lock_hash) > LOCK_READ_LIMIT:
+        print(f"✗ dataset.lock is larger than {LOCK_READ_LIMIT} bytes")
+        return False
+    lock_hash = lock_hash.strip()
     
-    if lock_hash != metadata['hash_sha256']:
+    if not hmac.compare_digest(lock_hash, dataset_hash(metadata).encode('ascii')):
         print(f"✗ Dataset hash mismatch!")
-        print(f"  Lock:     {lock_hash}")
-        print(f"  Metadata: {metadata['hash_sha256']}")
+        print(f"  Lock:     {lock_hash.decode('ascii', 'replace')}")
+        print(f"  Metadata: {dataset_hash(metadata)}")
         return False
     
     return True
 
 
-def run_benchmark_impl(
+def _measure_once(fn: Callable[[], Any]) -> int:
+    """Time one call of fn with the monotonic ns clock; returns nanoseconds."""
+    t0 = time.perf_counter_ns()
+    fn()
+    return time.perf_counter_ns() - t0
+
+
+def to_ms(samples_ns: List[int]) -> List[float]:
+    """Convert raw ns samples to ms (only done at aggregation time)."""
+    return [ns / 1e6 for ns in samples_ns]
+
+
+def prepare_benchmark_impl(
     impl: str,
     variant: str,
     metadata: Dict,
@@ -77,31 +144,17 @@ def run_benchmark_impl(
     warmup: int,
     runs: int,
     repeat: int,
-    cpu_affinity: Optional[int],
-    enforce_single_thread: bool,
-    enable_profiling: bool = True
-) -> tuple[List[float], Optional[Dict]]:
+    enforce_single_thread: bool
+) -> Callable[[int], int]:
     """
-    Run a single benchmark implementation.
+    Warm up one implementation.
     
     Returns:
-        Tuple of (samples, profile_data)
+        run_single(run_idx) callable performing one measurement run and
+        returning its duration in ns
     """
-    print(f"\nRunning {impl}/{variant}...")
-    
-    # Set environment for single-threaded execution
-    env = os.environ.copy()
-    if enforce_single_thread:
-        env.update({
-            'OMP_NUM_THREADS': '1',
-            'MKL_NUM_THREADS': '1',
-            'OPENBLAS_NUM_THREADS': '1',
-            'NUMEXPR_NUM_THREADS': '1',
-            'GOMAXPROCS': '1'
-        })
-    
-    samples = []
-    all_profile_samples = []
+    # Single-threaded execution: when the real implementation is spawned,
+    # pass env={**os.environ, **SINGLE_THREAD_ENV} if enforce_single_thread
     
     # Warmup runs
     print(f"  Warmup: {warmup} runs...")
@@ -110,6 +163,74 @@ def run_benchmark_impl(
         duration_ms = 1500.0 + (i % 3) * 10  # Mock data
         print(f"    Run {i+1}/{warmup}: {duration_ms:.1f}ms")
     
+    # Simulate benchmark - in production, run_single would return
+    # _measure_once(lambda: <actual implementation call>)
+    # For baseline (naive), slightly slower
+    if variant == 'naive':
+        base_duration = 1520.0
+    else:  # optimized (numpy, etc.)
+        base_duration = 1212.0
+    
+    # Add some realistic variance (all runs drawn in one vectorized call)
+    rng = np.random.default_rng(42)
+    durations = base_duration + rng.standard_normal(runs) * 6.0
+    durations_ns = np.rint(durations * 1e6).astype(np.int64)
+    
+    def run_single(run_idx: int) -> int:
+        return int(durations_ns[run_idx])
+    
+    return run_single
+
+
+def collect_profile(profiler: Optional['ResourceProfiler']) -> Optional[Dict]:
+    """Stop a profiler (if any) and return its summary and curve."""
+    if not profiler:
+        return None
+    profiler.stop()
+    return {
+        'summary': profiler.get_summary(),
+        'curve': profiler.get_profile_curve(points=100)
+    }
+
+
+def print_impl_stats(samples_ns: List[int], profile_data: Optional[Dict]):
+    """Print median/std/CV (and resource usage) for one implementation."""
+    durations = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    median = float(np.median(durations))
+    std = float(durations.std(ddof=1)) if durations.size > 1 else 0
+    cv_pct = (std / median * 100) if median > 0 else 0
+    
+    print(f"  ✓ Complete: median={median:.1f}ms, std={std:.1f}ms, CV={cv_pct:.2f}%")
+    if profile_data:
+        summary = profile_data['summary']
+        if not summary.get('sample_count'):
+            print("    Resources: no samples (runs shorter than the sampling window)")
+            return
+        print(f"    Resources: CPU={summary['cpu_avg']:.1f}%, RAM={summary['ram_avg_mb']:.1f}MB, I/O={summary['io_total_mb']:.1f}MB")
+
+
+def run_benchmark_impl(
+    impl: str,
+    variant: str,
+    metadata: Dict,
+    data_dir: str,
+    warmup: int,
+    runs: int,
+    repeat: int,
+    enforce_single_thread: bool,
+    enable_profiling: bool = True
+) -> tuple[List[int], Optional[Dict]]:
+    """
+    Run a single benchmark implementation, all runs back to back.
+    
+    Returns:
+        Tuple of (samples_ns, profile_data)
+    """
+    print(f"\nRunning {impl}/{variant}...")
+    run_single = prepare_benchmark_impl(
+        impl, variant, metadata, data_dir, warmup, runs, repeat, enforce_single_thread
+    )
+    
     # Measurement runs
     print(f"  Measurement: {runs} runs x {repeat} repeats...")
     
@@ -119,75 +240,122 @@ def run_benchmark_impl(
         profiler = ResourceProfiler(sample_interval=0.05)
         profiler.start()
     
+    samples_ns = []
     for run in range(runs):
-        # Simulate benchmark - in production, this would call the actual implementation
-        # For baseline (naive), slightly slower
-        if variant == 'naive':
-            base_duration = 1520.0
-        else:  # optimized (numpy, etc.)
-            base_duration = 1212.0
-        
-        # Add some realistic variance
-        import random
-        random.seed(42 + run)
-        duration_ms = base_duration + random.gauss(0, 6)
-        
-        samples.append(duration_ms)
-        
+        samples_ns.append(run_single(run))
         if (run + 1) % 10 == 0:
             print(f"    Progress: {run+1}/{runs} runs")
     
-    # Stop profiler and get data
-    profile_data = None
-    if profiler:
-        profile_samples = profiler.stop()
-        profile_data = {
-            'summary': profiler.get_summary(),
-            'curve': profiler.get_profile_curve(points=100)
-        }
-    
-    median = statistics.median(samples)
-    std = statistics.stdev(samples) if len(samples) > 1 else 0
-    cv_pct = (std / median * 100) if median > 0 else 0
+    profile_data = collect_profile(profiler)
+    print_impl_stats(samples_ns, profile_data)
     
-    print(f"  ✓ Complete: median={median:.1f}ms, std={std:.1f}ms, CV={cv_pct:.2f}%")
-    if profile_data:
-        summary = profile_data['summary']
-        print(f"    Resources: CPU={summary['cpu_avg']:.1f}%, RAM={summary['ram_avg_mb']:.1f}MB, I/O={summary['io_total_mb']:.1f}MB")
+    return samples_ns, profile_data
+
+
+def run_interleaved(
+    impls: List[Tuple[str, str]],
+    metadata: Dict,
+    data_dir: str,
+    warmup: int,
+    runs: int,
+    repeat: int,
+    enforce_single_thread: bool,
+    enable_profiling: bool = True
+) -> Tuple[List[Tuple[str, str, List[int]]], Dict[str, Dict]]:
+    """
+    Run all implementations, alternating between them on every run.
+    
+    Time-correlated noise (frequency drift, thermals, background load) is
+    spread evenly over the implementations instead of landing on whichever
+    one happened to run during it. Each implementation is warmed up first.
+    Its profiler thread stays up for the whole loop but only samples during
+    its own measurement runs.
+    
+    Returns:
+        Tuple of (results, profiles) in the same shape as the sequential path
+    """
+    runners = []
+    for impl, variant in impls:
+        print(f"\nPreparing {impl}/{variant}...")
+        run_single = prepare_benchmark_impl(
+            impl, variant, metadata, data_dir, warmup, runs, repeat, enforce_single_thread
+        )
+        profiler = None
+        if enable_profiling and PROFILER_AVAILABLE:
+            profiler = ResourceProfiler(sample_interval=0.05)
+            profiler.start(paused=True)
+        runners.append((impl, variant, run_single, profiler, []))
     
-    return samples, profile_data
+    print(f"\nMeasurement (interleaved): {runs} runs x {repeat} repeats per implementation...")
+    for run in range(runs):
+        for impl, variant, run_single, profiler, samples_ns in runners:
+            if profiler:
+                profiler.resume()
+            samples_ns.append(run_single(run))
+            if profiler:
+                profiler.pause()
+        if (run + 1) % 10 == 0:
+            print(f"    Progress: {run+1}/{runs} runs")
+    
+    results = []
+    profiles = {}
+    for impl, variant, _, profiler, samples_ns in runners:
+        print(f"\n{impl}/{variant}:")
+        profile_data = collect_profile(profiler)
+        print_impl_stats(samples_ns, profile_data)
+        results.append((impl, variant, samples_ns))
+        if profile_data:
+            profiles[f"{impl}/{variant}"] = profile_data
+    
+    return results, profiles
+
+
+def write_json(path, data: Any):
+    """Write data as indented JSON, using orjson when installed."""
+    if ORJSON_AVAILABLE:
+        Path(path).write_bytes(
+            orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        )
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
 
 
 def save_results(
-    results: Dict[str, List[float]],
+    results: List[Tuple[str, str, List[int]]],
     profiles: Dict[str, Dict],
     output_dir: str,
     metadata: Dict,
     config: Dict
 ):
-    """Save benchmark results and profiles to CSV and JSON."""
+    """
+    Save benchmark results and profiles to CSV and JSON.
+    
+    Args:
+        results: (impl, variant, samples_ns) per implementation, raw ns
+    """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
     # Save raw results to CSV
     csv_file = output_path / "results.csv"
+    # Render the whole CSV in memory, then hand it to the OS in one write
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(['impl', 'variant', 'run', 'duration_ms', 'duration_ns'])
+    writer.writerows(
+        (impl, variant, i, ns / 1e6, ns)
+        for impl, variant, samples_ns in results
+        for i, ns in enumerate(samples_ns)
+    )
     with open(csv_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['impl', 'variant', 'run', 'duration_ms'])
-        
-        for impl_variant, samples in results.items():
-            impl, variant = impl_variant.split('/')
-            for i, duration in enumerate(samples):
-                writer.writerow([impl, variant, i, duration])
+        f.write(buf.getvalue())
     
     print(f"\n✓ Saved results to {csv_file}")
     
     # Calculate statistics
-    baseline_key = list(results.keys())[0]
-    optimized_key = list(results.keys())[1] if len(results) > 1 else baseline_key
-    
-    baseline_samples = results[baseline_key]
-    optimized_samples = results[optimized_key]
+    baseline_samples = to_ms(results[0][2])
+    optimized_samples = to_ms(results[1][2]) if len(results) > 1 else baseline_samples
     
     summary = {
         'metadata': metadata,
@@ -200,14 +368,13 @@ def save_results(
         'stability_enabled': config['stability_enabled'],
         'stability_mode': config['stability_mode'],
         'waited_seconds': config.get('waited_seconds', 0),
-        'cpu_affinity': config.get('cpu_affinity') or 2,
+        'cpu_affinity': config.get('cpu_affinity'),
         'resource_profiles': profiles
     }
     
     # Save summary to JSON
     json_file = output_path / "summary.json"
-    with open(json_file, 'w') as f:
-        json.dump(summary, f, indent=2)
+    write_json(json_file, summary)
     
     print(f"✓ Saved summary to {json_file}")
 
@@ -236,6 +403,9 @@ def main():
                         help='Enforce single-threaded execution')
     parser.add_argument('--cpu-affinity', type=int,
                         help='Pin to specific CPU core')
+    parser.add_argument('--no-interleave', action='store_true',
+                        help='Run all measurements of one implementation before the next '
+                             '(default: alternate implementations on every run)')
     parser.add_argument('--impls', required=True,
                         help='Comma-separated list of implementations (e.g., python-naive,python-numpy)')
     parser.add_argument('--ebpf-agent', type=str,
@@ -249,7 +419,7 @@ def main():
     print(f"Loading metadata from {args.metadata}...")
     metadata = load_metadata(args.metadata)
     print(f"  Dataset: N={metadata['N']}, M={metadata['M']}, D={metadata['D']}")
-    print(f"  Hash: {metadata['hash_sha256'][:16]}...")
+    print(f"  Hash: {metadata.get('hash_algo', 'sha256')}:{dataset_hash(metadata)[:16]}...")
     
     # Verify dataset lock
     data_dir = Path(args.metadata).parent
@@ -279,7 +449,7 @@ def main():
         print(f"  - {impl}/{variant}")
     
     # Run benchmarks
-    results = {}
+    results = []  # (impl, variant, samples_ns), in --impls order
     profiles = {}
     config = {
         'warmup': args.warmup,
@@ -290,30 +460,43 @@ def main():
         'waited_seconds': waited_seconds,
         'cpu_affinity': args.cpu_affinity,
         'enforce_single_thread': args.enforce_single_thread,
+        'interleaved': not args.no_interleave,
         'ebpf_agent': args.ebpf_agent
     }
     
-    for impl, variant in impls:
-        samples, profile_data = run_benchmark_impl(
-            impl, variant, metadata, str(data_dir),
+    # Pin once, before any warmup/measurement, so every impl runs on the
+    # same core
+    if args.cpu_affinity is not None:
+        config['cpu_affinity_applied'] = apply_cpu_affinity(args.cpu_affinity)
+        if config['cpu_affinity_applied']:
+            print(f"\nPinned to CPU(s) {config['cpu_affinity_applied']}")
+    
+    if config['interleaved']:
+        results, profiles = run_interleaved(
+            impls, metadata, str(data_dir),
             args.warmup, args.runs, args.repeat,
-            args.cpu_affinity, args.enforce_single_thread,
+            args.enforce_single_thread,
             enable_profiling=True
         )
-        results[f"{impl}/{variant}"] = samples
-        if profile_data:
-            profiles[f"{impl}/{variant}"] = profile_data
+    else:
+        for impl, variant in impls:
+            samples_ns, profile_data = run_benchmark_impl(
+                impl, variant, metadata, str(data_dir),
+                args.warmup, args.runs, args.repeat,
+                args.enforce_single_thread,
+                enable_profiling=True
+            )
+            results.append((impl, variant, samples_ns))
+            if profile_data:
+                profiles[f"{impl}/{variant}"] = profile_data
     
     # Save results
     save_results(results, profiles, args.output, metadata, config)
     
     # Calculate and display gain
     if len(results) >= 2:
-        baseline_samples = list(results.values())[0]
-        optimized_samples = list(results.values())[1]
-        
-        baseline_median = statistics.median(baseline_samples)
-        optimized_median = statistics.median(optimized_samples)
+        baseline_median = float(np.median(results[0][2])) / 1e6
+        optimized_median = float(np.median(results[1][2])) / 1e6
         
         delta_ms = baseline_median - optimized_median
         gain_pct = (delta_ms / baseline_median * 100) if baseline_median > 0 else 0
@@ -16,16 +16,51 @@ import hashlib
 import socket
 import platform
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Any
-import statistics
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Resource-profile curves are float32 arrays rounded to this many decimals
+# (plenty for plotting); orjson writes them natively, the stdlib json
+# fallback re-rounds after widening to Python floats
+CURVE_DECIMALS = 2
+
+# Default impact assumptions (recorded in the report alongside the outputs)
+IMPACT_INPUTS = {
+    'executions_per_day': 100,
+    'days_per_year': 250,
+    'cost_model': 'infra',
+    'cost_per_hour_eur': 0.50,
+    'electricity_kwh_per_hour': 0.15,
+    'co2_kg_per_kwh': 0.475
+}
+
+
+def index_entries(entries: List[Dict]) -> Dict[str, Dict]:
+    """Map implementation name -> entry (first occurrence wins)."""
+    index = {}
+    for entry in entries:
+        index.setdefault(entry['implementation'], entry)
+    return index
+
+
+def lookup_entry(index: Dict[str, Dict], implementation: str) -> Dict:
+    """Find an entry in an index built by index_entries."""
+    try:
+        return index[implementation]
+    except KeyError:
+        raise ValueError(f"Implementation '{implementation}' not found in entries") from None
 
 
 def find_entry(entries: List[Dict], implementation: str) -> Dict:
     """Find an entry by implementation name."""
-    for entry in entries:
-        if entry['implementation'] == implementation:
-            return entry
-    raise ValueError(f"Implementation '{implementation}' not found in entries")
+    return lookup_entry(index_entries(entries), implementation)
 
 
 def generate_mock_samples(cpu_time_ms: float, count: int = 30) -> List[float]:
@@ -33,13 +68,13 @@ def generate_mock_samples(cpu_time_ms: float, count: int = 30) -> List[float]:
     Generate mock samples around a mean value with realistic variance.
     Uses CV% of ~0.5% for stable measurements.
     """
-    import random
-    random.seed(42)
+    rng = np.random.default_rng(42)
     
     # Add small variance (CV ~0.5%)
     std = cpu_time_ms * 0.005
-    samples = [max(0.1, random.gauss(cpu_time_ms, std)) for _ in range(count)]
-    return samples
+    samples = rng.normal(cpu_time_ms, std, count)
+    np.maximum(samples, 0.1, out=samples)
+    return samples.tolist()
 
 
 def calculate_stats(samples: List[float]) -> Dict[str, float]:
@@ -54,18 +89,23 @@ def calculate_stats(samples: List[float]) -> Dict[str, float]:
             'p90': 0.0
         }
     
-    sorted_samples = sorted(samples)
-    n = len(sorted_samples)
-    
-    median = statistics.median(sorted_samples)
-    mean = statistics.mean(sorted_samples)
-    std = statistics.stdev(sorted_samples) if n > 1 else 0.0
-    cv_pct = (std / mean * 100) if mean > 0 else 0.0
+    values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+    n = values.size
     
+    # Same convention as report-builder: percentiles use the truncated
+    # index into the sorted samples, the median averages the middle pair
     p10_idx = int(n * 0.1)
     p90_idx = int(n * 0.9)
-    p10 = sorted_samples[p10_idx]
-    p90 = sorted_samples[p90_idx]
+    lo_mid, hi_mid = (n - 1) // 2, n // 2
+    part = np.partition(values, [p10_idx, lo_mid, hi_mid, p90_idx])
+    
+    median = float((part[lo_mid] + part[hi_mid]) / 2)
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if n > 1 else 0.0
+    cv_pct = (std / mean * 100) if mean > 0 else 0.0
+    
+    p10 = float(part[p10_idx])
+    p90 = float(part[p90_idx])
     
     return {
         'median': median,
@@ -79,23 +119,37 @@ def calculate_stats(samples: List[float]) -> Dict[str, float]:
 
 def create_resource_profile(entry: Dict) -> Dict:
     """Create resource profile from entry data."""
-    # Generate realistic timeline data (50 points)
-    import random
-    random.seed(hash(entry['implementation']))
+    return _profile_cached(
+        entry['implementation'],
+        entry['cpu_usage_percent'],
+        entry['max_ram_mb'],
+        entry['cpu_processing_time_ms']
+    )
+
+
+@lru_cache(maxsize=None)
+def _profile_cached(impl_name: str, cpu_avg: float, ram_avg: float, duration_ms: float) -> Dict:
+    """
+    Build the (deterministic) profile for one set of entry values.
     
-    cpu_avg = entry['cpu_usage_percent']
-    ram_avg = entry['max_ram_mb']
+    Results are shared between entries with the same values, so callers
+    must treat the returned dict as read-only.
+    """
+    # Generate realistic timeline data (50 points)
+    seed = np.random.SeedSequence(hash(impl_name) & 0xFFFFFFFFFFFFFFFF)
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((2, 50))  # row 0: CPU, row 1: RAM
     
     # Generate stable curves with minimal variance (like real profiling)
     # CPU: stable around avg with tiny fluctuations
     timestamps = [i * 2 for i in range(50)]  # 0-100 timeline
-    cpu_curve = [max(0, min(100, cpu_avg + random.gauss(0, 0.5))) for _ in range(50)]
+    cpu_curve = np.clip(cpu_avg + noise[0] * 0.5, 0, 100)
     
     # RAM: stable around avg (not max!) with tiny fluctuations
-    ram_curve = [max(0, ram_avg + random.gauss(0, ram_avg * 0.01)) for _ in range(50)]
+    ram_curve = np.maximum(0, ram_avg + noise[1] * (ram_avg * 0.01))
     
     # I/O: minimal activity (realistic for CPU-bound tasks)
-    io_curve = [random.uniform(0, 0.5) for _ in range(50)]
+    io_curve = rng.uniform(0, 0.5, 50)
     
     # GPU: no data
     gpu_curve = [0] * 50
@@ -103,24 +157,44 @@ def create_resource_profile(entry: Dict) -> Dict:
     return {
         'summary': {
             'cpu_avg': round(cpu_avg, 2),
-            'cpu_max': round(max(cpu_curve), 2),
+            'cpu_max': round(float(cpu_curve.max()), 2),
             'ram_avg_mb': round(ram_avg, 2),
-            'ram_max_mb': round(max(ram_curve), 2),
-            'io_total_mb': round(sum(io_curve), 2),
+            'ram_max_mb': round(float(ram_curve.max()), 2),
+            'io_total_mb': round(float(io_curve.sum()), 2),
             'gpu_avg': 0.0,
-            'duration_ms': entry['cpu_processing_time_ms'],
+            'duration_ms': duration_ms,
             'sample_count': 50
         },
         'curve': {
             'timestamps': timestamps,
-            'cpu': [round(v, 2) for v in cpu_curve],
-            'ram': [round(v, 2) for v in ram_curve],
-            'io': [round(v, 2) for v in io_curve],
+            'cpu': np.round(cpu_curve, CURVE_DECIMALS).astype(np.float32),
+            'ram': np.round(ram_curve, CURVE_DECIMALS).astype(np.float32),
+            'io': np.round(io_curve, CURVE_DECIMALS).astype(np.float32),
             'gpu': gpu_curve
         }
     }
 
 
+def calculate_impact(delta_ms, inputs: Dict = IMPACT_INPUTS) -> Dict:
+    """
+    Yearly impact of saving delta_ms per execution.
+    
+    Same formula as report-builder's calculate_impact: delta_ms may be a
+    float or a NumPy array of deltas; every output then has the same shape.
+    """
+    time_saved_hours_per_year = (
+        delta_ms * inputs['executions_per_day'] * inputs['days_per_year']
+    ) / 3_600_000
+    electricity_saved_kwh_per_year = time_saved_hours_per_year * inputs['electricity_kwh_per_hour']
+    
+    return {
+        'time_saved_hours_per_year': time_saved_hours_per_year,
+        'cost_saved_eur_per_year': time_saved_hours_per_year * inputs['cost_per_hour_eur'],
+        'electricity_saved_kwh_per_year': electricity_saved_kwh_per_year,
+        'co2_avoided_kg_per_year': electricity_saved_kwh_per_year * inputs['co2_kg_per_kwh']
+    }
+
+
 def convert_to_report(
     input_data: Dict,
     baseline_impl: str,
@@ -130,10 +204,11 @@ def convert_to_report(
     """Convert custom format to ChainBench report.json format."""
     
     entries = input_data['entries']
+    index = index_entries(entries)
     
     # Find baseline and optimized entries
-    baseline_entry = find_entry(entries, baseline_impl)
-    optimized_entry = find_entry(entries, optimized_impl)
+    baseline_entry = lookup_entry(index, baseline_impl)
+    optimized_entry = lookup_entry(index, optimized_impl)
     
     # Generate mock samples based on cpu_processing_time_ms
     baseline_samples = generate_mock_samples(baseline_entry['cpu_processing_time_ms'])
@@ -147,26 +222,14 @@ def convert_to_report(
     delta_ms = baseline_stats['median'] - optimized_stats['median']
     gain_pct = (delta_ms / baseline_stats['median'] * 100) if baseline_stats['median'] > 0 else 0.0
     
-    # Determine verdict based on CV%
-    verdict = 'conclusive' if baseline_stats['cv_pct'] < 5.0 and optimized_stats['cv_pct'] < 5.0 else 'inconclusive'
+    # Determine verdict based on the worse CV% (a zero baseline median means
+    # no usable samples, so it cannot be conclusive either)
+    worst_cv = max(baseline_stats['cv_pct'], optimized_stats['cv_pct'])
+    verdict = 'conclusive' if baseline_stats['median'] > 0 and worst_cv < 5.0 else 'inconclusive'
     
     # Calculate impact
-    impact_inputs = {
-        'executions_per_day': 100,
-        'days_per_year': 250,
-        'cost_model': 'infra',
-        'cost_per_hour_eur': 0.50,
-        'electricity_kwh_per_hour': 0.15,
-        'co2_kg_per_kwh': 0.475
-    }
-    
-    time_saved_hours_per_year = (delta_ms * 100 * 250) / 3_600_000
-    impact_outputs = {
-        'time_saved_hours_per_year': time_saved_hours_per_year,
-        'cost_saved_eur_per_year': time_saved_hours_per_year * 0.50,
-        'electricity_saved_kwh_per_year': time_saved_hours_per_year * 0.15,
-        'co2_avoided_kg_per_year': time_saved_hours_per_year * 0.15 * 0.475
-    }
+    impact_inputs = dict(IMPACT_INPUTS)
+    impact_outputs = calculate_impact(delta_ms, impact_inputs)
     
     # Create resource profiles for all implementations
     resource_profiles = {}
@@ -186,22 +249,25 @@ def convert_to_report(
             'seed': 42
         }
     
+    # Read clock, hostname and platform details once
+    now = datetime.utcnow().isoformat()
+    hostname = socket.gethostname()
+    machine = {
+        'hostname': hostname,
+        'os': platform.system(),
+        'kernel': platform.release(),
+        'cpu_model': platform.processor() or 'unknown',
+    }
+    
     # Build report
     report = {
         'schema_version': '1.0.0',
         'meta': {
-            'report_id': hashlib.sha256(
-                f"{datetime.utcnow().isoformat()}{socket.gethostname()}".encode()
-            ).hexdigest()[:16],
-            'generated_at': datetime.utcnow().isoformat() + 'Z',
+            'report_id': hashlib.sha256(f"{now}{hostname}".encode()).hexdigest()[:16],
+            'generated_at': now + 'Z',
             'app_version': '1.0.0',
             'git_commit': None,
-            'machine': {
-                'hostname': socket.gethostname(),
-                'os': platform.system(),
-                'kernel': platform.release(),
-                'cpu_model': platform.processor() or 'unknown',
-            },
+            'machine': machine,
             'dataset': dataset_info
         },
         'benchmark': {
@@ -271,6 +337,56 @@ def convert_to_report(
     return report
 
 
+def _json_default(obj: Any) -> Any:
+    """Serialize numpy curves for the stdlib json fallback."""
+    if isinstance(obj, np.ndarray):
+        # float32 -> Python float widens 45.23 to 45.22999954..., round back
+        return [round(x, CURVE_DECIMALS) for x in obj.tolist()]
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(value: Any) -> bytes:
+    """Serialize one value as 2-space-indented JSON, using orjson when installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, indent=2, default=_json_default).encode()
+
+
+def stream_json(obj: Dict, f, streamed_keys=('resource_profiles',)):
+    """
+    Write a dict to a binary file as indented JSON, one value at a time.
+    
+    Only one top-level value (or, for keys in streamed_keys, one inner
+    item) is serialized at any moment instead of the whole report. The
+    output is byte-identical to a single indented dump.
+    
+    Args:
+        obj: Top-level dict to write
+        f: File opened in binary mode
+        streamed_keys: Top-level keys whose dict values are written item by item
+    """
+    def write_items(items, depth: int):
+        indent = b'\n' + b'  ' * (depth + 1)
+        empty = True
+        f.write(b'{')
+        for key, value in items:
+            f.write((indent if empty else b',' + indent) + _dumps(key) + b': ')
+            empty = False
+            if depth == 0 and key in streamed_keys and isinstance(value, dict):
+                write_items(value.items(), depth + 1)
+            else:
+                f.write(_dumps(value).replace(b'\n', indent))
+        f.write(b'}' if empty else b'\n' + b'  ' * depth + b'}')
+    
+    write_items(obj.items(), 0)
+
+
+def write_json(path, data: Dict):
+    """Write a report as indented JSON, streamed key by key (see stream_json)."""
+    with open(path, 'wb') as f:
+        stream_json(data, f)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Convert custom benchmark results to ChainBench report.json'
@@ -290,8 +406,7 @@ def main():
     report = convert_to_report(input_data, args.baseline, args.optimized)
     
     print(f"Writing report to {args.output}")
-    with open(args.output, 'w') as f:
-        json.dump(report, f, indent=2)
+    write_json(args.output, report)
     
     print(f"\n✓ Report generated: {args.output}")
     print(f"  - Baseline: {report['summary']['baseline_stats']['median']:.2f} ms ({args.baseline})")
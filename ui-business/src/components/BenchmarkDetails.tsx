@@ -18,8 +18,11 @@ export default function BenchmarkDetails({ report }: Props) {
             <h3 className="text-white font-semibold mb-3">Dataset</h3>
             <div className="space-y-2 text-sm">
               <div className="flex justify-between">
-                <span className="text-slate-400">SHA256</span>
-                <span className="text-slate-300 font-mono text-xs">{meta.dataset.hash_sha256.slice(0, 16)}...</span>
+                <span className="text-slate-400">
+                  {(meta.dataset.hash_algo ?? 'sha256').toUpperCase()}
+                  {(meta.dataset.hash_chunks ?? 1) > 1 && ` (${meta.dataset.hash_chunks} slices)`}
+                </span>
+                <span className="text-slate-300 font-mono text-xs">{(meta.dataset.hash ?? meta.dataset.hash_sha256).slice(0, 16)}...</span>
               </div>
               <div className="flex justify-between">
                 <span className="text-slate-400">Embeddings (N)</span>
@@ -10,6 +10,9 @@ const MachineSchema = z.object({
 
 const DatasetSchema = z.object({
   hash_sha256: z.string(),
+  hash_algo: z.enum(['sha256', 'sha256-tree', 'blake3']).optional(),
+  hash: z.string().optional(),
+  hash_chunks: z.number().optional(),
   N: z.number(),
   M: z.number(),
   D: z.number(),